@@ -7,4 +7,17 @@ TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
 BASE_URL = "https://www.halleyweb.com/c065001/mc/"
 ALBO_URL = BASE_URL + "mc_p_ricerca.php?noHeaderFooter=1&multiente=c065001"
 DB_NAME = "pubblicazioni.db"
+# Iscrizioni alle notifiche: database locale non versionato e/o regole da secret
+ISCRIZIONI_DB_NAME = os.environ.get("ISCRIZIONI_DB", "iscrizioni.db")
+TELEGRAM_ISCRIZIONI = os.environ.get("TELEGRAM_ISCRIZIONI")
+STATO_NAME = os.environ.get("SCRAPER_STATO", "stato.json")  # stato locale dello scraper, non versionato
+SNAPSHOT_NAME = "pubblicazioni.parquet"  # snapshot colonnare per la dashboard
 TIMEOUT = 10  # secondi
+HTTP_MAX_RETRIES = 3  # nuovi tentativi su errori 5xx, timeout e connessione
+HTTP_BACKOFF = 1  # secondi, raddoppiati a ogni tentativo (con jitter)
+HTTP_POOL_SIZE = 4  # connessioni keep-alive per host
+CIRCUIT_THRESHOLD = 5  # errori consecutivi prima di sospendere le richieste
+CIRCUIT_COOLDOWN = 300  # secondi di sospensione del circuito
+RUN_BUDGET = 20 * 60  # secondi massimi per un'esecuzione dello scraper
+DIGEST_GIORNI = 7  # giorni considerati dal riepilogo quotidiano delle pubblicazioni in scadenza
+TELEGRAM_MAX_WORKERS = 8  # invii Telegram concorrenti verso gli iscritti
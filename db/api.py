@@ -0,0 +1,187 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gzip
+import hashlib
+import json
+import re
+import sqlite3
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from db.db_manager import DatabaseManager
+
+try:
+    import brotli
+except ImportError:  # la compressione brotli è opzionale
+    brotli = None
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MIN_COMPRESS_BYTES = 1024  # le risposte più piccole non vengono compresse
+SQLITE_INT_MIN, SQLITE_INT_MAX = -2 ** 63, 2 ** 63 - 1  # interi accettati da SQLite
+
+class ApiError(Exception):
+    def __init__(self, status, messaggio):
+        super().__init__(messaggio)
+        self.status = status
+
+def _intero(params, nome, default=None):
+    valore = params.get(nome, [None])[0]
+    if valore is None or valore == "":
+        return default
+    try:
+        numero = int(valore)
+    except ValueError:
+        raise ApiError(400, f"Il parametro '{nome}' deve essere un numero intero")
+    if not SQLITE_INT_MIN <= numero <= SQLITE_INT_MAX:
+        raise ApiError(400, f"Il parametro '{nome}' è fuori dall'intervallo consentito")
+    return numero
+
+def _limit(params):
+    return max(1, min(_intero(params, "limit", DEFAULT_LIMIT), MAX_LIMIT))
+
+def _pagina(righe, limit):
+    """Risposta paginata: il cursore `prima_di` della pagina successiva è l'ultimo numero restituito."""
+    prossimo = righe[-1]["numero_pubblicazione"] if len(righe) == limit else None
+    return {"pubblicazioni": righe, "prima_di": prossimo}
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    API JSON in sola lettura sull'archivio delle pubblicazioni:
+      GET /pubblicazioni?limit=&prima_di=&mittente=&tipo_atto=   elenco dalla più recente
+      GET /pubblicazioni/<numero>                                dettaglio
+      GET /cerca?q=&limit=&prima_di=                             ricerca testuale
+      GET /aggregati                                             conteggi per mittente, tipo e mese
+      GET /feed?dal=<cursore>&limit=                             pubblicazioni salvate dopo <cursore>
+
+    Il `dal` del feed è un cursore opaco (non un numero di pubblicazione): si parte da 0 e
+    si passa alla richiesta successiva il valore `dal` restituito dalla risposta precedente.
+
+    Le risposte hanno un ETag forte derivato dallo stato dei dati: finché non arrivano
+    nuove pubblicazioni, una richiesta con If-None-Match riceve 304 senza interrogare l'archivio.
+    """
+
+    db_manager = None
+    server_version = "AlboAPI/1.0"
+
+    def _elenco(self, params):
+        limit = _limit(params)
+        righe = self.db_manager.elenca_pubblicazioni(
+            limit, _intero(params, "prima_di"),
+            params.get("mittente", [None])[0], params.get("tipo_atto", [None])[0]
+        )
+        return _pagina(righe, limit)
+
+    def _cerca(self, params):
+        testo = params.get("q", [""])[0].strip()
+        if not testo:
+            raise ApiError(400, "Il parametro 'q' è obbligatorio")
+        limit = _limit(params)
+        return _pagina(self.db_manager.cerca_pubblicazioni(testo, limit, _intero(params, "prima_di")), limit)
+
+    def _feed(self, params):
+        dal = _intero(params, "dal", 0)
+        righe = self.db_manager.get_pubblicazioni_dal(dal, _limit(params))
+        if righe:
+            dal = righe[-1]["_cursore"]
+        for riga in righe:
+            del riga["_cursore"]
+        # Senza nuove pubblicazioni il cursore resta invariato
+        return {"pubblicazioni": righe, "dal": dal}
+
+    def _aggregati(self, params):
+        return self.db_manager.get_aggregati()
+
+    def _dettaglio(self, params, numero):
+        pubblicazione = self.db_manager.get_pubblicazione(numero)
+        if pubblicazione is None:
+            raise ApiError(404, f"Pubblicazione {numero} non trovata")
+        return pubblicazione
+
+    ROUTES = {
+        "/pubblicazioni": _elenco,
+        "/cerca": _cerca,
+        "/feed": _feed,
+        "/aggregati": _aggregati,
+    }
+
+    def _codifica(self):
+        accettate = [c.split(";")[0].strip() for c in self.headers.get("Accept-Encoding", "").split(",")]
+        if brotli is not None and "br" in accettate:
+            return "br"
+        if "gzip" in accettate:
+            return "gzip"
+        return "identity"
+
+    def _invia(self, status, corpo, codifica, etag=None):
+        if codifica != "identity" and len(corpo) >= MIN_COMPRESS_BYTES:
+            corpo = brotli.compress(corpo) if codifica == "br" else gzip.compress(corpo)
+        else:
+            codifica = "identity"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.send_header("Vary", "Accept-Encoding")
+        if codifica != "identity":
+            self.send_header("Content-Encoding", codifica)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        codifica = self._codifica()
+
+        dettaglio = re.fullmatch(r"/pubblicazioni/([^/]+)", url.path)
+        handler = self.ROUTES.get(url.path.rstrip("/") or "/")
+        if handler is None and dettaglio is None:
+            self._invia(404, json.dumps({"errore": "Risorsa non trovata"}).encode("utf-8"), codifica)
+            return
+
+        try:
+            # L'ETag dipende solo dallo stato dei dati, dalla richiesta e dalla codifica della risposta
+            watermark = self.db_manager.get_watermark()
+            chiave = f"{watermark}|{self.path}|{codifica}".encode("utf-8")
+            etag = '"' + hashlib.sha256(chiave).hexdigest()[:32] + '"'
+            if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Vary", "Accept-Encoding")
+                self.end_headers()
+                return
+
+            if dettaglio is not None:
+                payload = self._dettaglio(params, unquote(dettaglio.group(1)))
+            else:
+                payload = handler(self, params)
+        except ApiError as e:
+            self._invia(e.status, json.dumps({"errore": str(e)}).encode("utf-8"), codifica)
+            return
+        except sqlite3.Error as e:
+            print("Errore del database durante la richiesta API:", e)
+            self._invia(500, json.dumps({"errore": "Errore interno del database"}).encode("utf-8"), codifica)
+            return
+
+        corpo = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._invia(200, corpo, codifica, etag)
+
+def avvia_api(host="127.0.0.1", port=8000, db_manager=None):
+    # Sola lettura: l'API non crea indici né modifica il database versionato
+    ApiHandler.db_manager = db_manager or DatabaseManager(sola_lettura=True)
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    print(f"API in ascolto su http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        print("Chiusura dell'API.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    host = os.environ.get("API_HOST", "127.0.0.1")
+    port = int(os.environ.get("API_PORT", "8000"))
+    avvia_api(host, port)
@@ -1,10 +1,52 @@
+import json
+import os
 import sqlite3
-from config import DB_NAME
+from datetime import datetime
+from urllib.parse import quote
+from config import DB_NAME, SNAPSHOT_NAME
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # lo snapshot colonnare è opzionale
+    pa = pq = None
+
+# Colonne dello snapshot con tipo dedicato
+DATE_COLUMNS = ("data_registro_generale", "data_inizio_pubblicazione", "data_fine_pubblicazione")
+DICTIONARY_COLUMNS = ("mittente", "tipo_atto")
+
+# Chiave dei metadati Parquet con il watermark del database al momento dell'esportazione
+SNAPSHOT_WATERMARK_KEY = b"albo_watermark"
+
+# Stato dei dati: ultimo rowid inserito e numero di pubblicazione più alto
+WATERMARK_QUERY = "SELECT MAX(rowid), MAX(CAST(numero_pubblicazione AS INTEGER)) FROM pubblicazioni"
+
+# Versione dello schema (PRAGMA user_version) da cui l'indice dei periodi è completo
+PERIODI_SCHEMA_VERSION = 1
+
+def _parse_data(valore):
+    """Converte una data "gg/mm/aaaa" in datetime.date (None se non valida)."""
+    try:
+        return datetime.strptime(valore, "%d/%m/%Y").date()
+    except (TypeError, ValueError):
+        return None
 
 class DatabaseManager:
-    def __init__(self, db_name=DB_NAME):
+    def __init__(self, db_name=DB_NAME, sola_lettura=False):
+        """
+        Con `sola_lettura` il database viene aperto in sola lettura e lo schema non viene
+        inizializzato (l'API non deve modificare il file versionato); restano disponibili
+        solo le interrogazioni.
+        """
         self.db_name = db_name
-        self.init_db()
+        self.sola_lettura = sola_lettura
+        if not sola_lettura:
+            self.init_db()
+
+    def _connetti(self):
+        if self.sola_lettura:
+            return sqlite3.connect(f"file:{quote(os.path.abspath(self.db_name))}?mode=ro", uri=True)
+        return sqlite3.connect(self.db_name)
 
     def init_db(self):
         with sqlite3.connect(self.db_name) as conn:
@@ -23,8 +65,43 @@ class DatabaseManager:
                     allegati TEXT
                 )
             """)
+            # Indice sul numero di pubblicazione come intero, per la paginazione ordinata dell'API
+            c.execute("""
+                CREATE INDEX IF NOT EXISTS idx_pubblicazioni_numero
+                ON pubblicazioni (CAST(numero_pubblicazione AS INTEGER))
+            """)
+            # Indice R*Tree dei periodi di pubblicazione (giorni come ordinali).
+            # La chiave è il numero di pubblicazione come intero e non il rowid implicito,
+            # che VACUUM può rinumerare in una tabella con chiave primaria TEXT.
+            c.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS pubblicazioni_periodi
+                USING rtree_i32(id, inizio, fine)
+            """)
+            # L'indice viene popolato per intero una sola volta, poi aggiornato da salva_pubblicazione
+            if c.execute("PRAGMA user_version").fetchone()[0] < PERIODI_SCHEMA_VERSION:
+                self._ricostruisci_periodi(c)
+                c.execute(f"PRAGMA user_version = {PERIODI_SCHEMA_VERSION}")
             conn.commit()
 
+    def _ricostruisci_periodi(self, c):
+        """Ricostruisce l'indice dei periodi a partire da tutte le pubblicazioni salvate."""
+        c.execute("DELETE FROM pubblicazioni_periodi")
+        righe = c.execute("""
+            SELECT numero_pubblicazione, data_inizio_pubblicazione, data_fine_pubblicazione FROM pubblicazioni
+        """).fetchall()
+        for numero, data_inizio, data_fine in righe:
+            self._indicizza_periodo(c, numero, data_inizio, data_fine)
+
+    def _indicizza_periodo(self, c, numero_pubblicazione, data_inizio, data_fine):
+        inizio, fine = _parse_data(data_inizio), _parse_data(data_fine)
+        # Le pubblicazioni senza un numero intero o un periodo valido restano fuori dall'indice
+        if not str(numero_pubblicazione).isdigit() or inizio is None or fine is None or fine < inizio:
+            return
+        c.execute(
+            "INSERT OR REPLACE INTO pubblicazioni_periodi VALUES (?, ?, ?)",
+            (int(numero_pubblicazione), inizio.toordinal(), fine.toordinal())
+        )
+
     def pubblicazione_esiste(self, numero_pubblicazione):
         with sqlite3.connect(self.db_name) as conn:
             c = conn.cursor()
@@ -54,6 +131,11 @@ class DatabaseManager:
                 documento,
                 allegati
             ))
+            if c.rowcount == 1:
+                self._indicizza_periodo(
+                    c, pubblicazione["numero_pubblicazione"],
+                    pubblicazione["data_inizio_pubblicazione"], pubblicazione["data_fine_pubblicazione"]
+                )
             conn.commit()
 
     def get_pubblicazioni(self):
@@ -61,3 +143,164 @@ class DatabaseManager:
             query = "SELECT * FROM pubblicazioni"
             data = conn.execute(query).fetchall()
         return data
+
+    def esporta_snapshot(self, path=SNAPSHOT_NAME):
+        """
+        Scrive uno snapshot colonnare (Parquet) dell'archivio per la dashboard:
+        date tipizzate, mittente e tipo atto con codifica a dizionario.
+        Il file viene sostituito in modo atomico; restituisce False se pyarrow non è disponibile.
+        Nei metadati dello schema viene salvato il watermark dei dati esportati (vedi get_watermark),
+        con cui la dashboard verifica che lo snapshot sia allineato al database.
+        """
+        if pa is None:
+            print("pyarrow non disponibile: snapshot Parquet non aggiornato.")
+            return False
+
+        with sqlite3.connect(self.db_name) as conn:
+            # Watermark e righe nella stessa transazione, così descrivono gli stessi dati
+            conn.execute("BEGIN")
+            watermark = conn.execute(WATERMARK_QUERY).fetchone()
+            cursor = conn.execute("SELECT * FROM pubblicazioni")
+            nomi = [d[0] for d in cursor.description]
+            righe = cursor.fetchall()
+            conn.rollback()
+
+        colonne = list(zip(*righe)) if righe else [()] * len(nomi)
+        arrays = []
+        for nome, valori in zip(nomi, colonne):
+            if nome in DATE_COLUMNS:
+                arrays.append(pa.array([_parse_data(v) for v in valori], type=pa.date32()))
+            elif nome in DICTIONARY_COLUMNS:
+                arrays.append(pa.array(valori, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(valori, type=pa.string()))
+
+        table = pa.Table.from_arrays(arrays, names=nomi)
+        table = table.replace_schema_metadata({SNAPSHOT_WATERMARK_KEY: json.dumps(list(watermark))})
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        return True
+
+    def snapshot_aggiornato(self, path=SNAPSHOT_NAME):
+        """Indica se lo snapshot esiste ed è stato esportato dallo stato attuale del database."""
+        if pq is None or not os.path.exists(path):
+            return False
+        metadata = pq.read_schema(path).metadata or {}
+        if SNAPSHOT_WATERMARK_KEY not in metadata:
+            return False
+        return json.loads(metadata[SNAPSHOT_WATERMARK_KEY]) == list(self.get_watermark())
+
+    # ---------------------- INTERROGAZIONI PER L'API ----------------------
+
+    def _interroga(self, query, params=()):
+        """Esegue una query in lettura e restituisce le righe come dizionari."""
+        with self._connetti() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def get_watermark(self):
+        """
+        Restituisce lo stato dei dati (ultimo rowid inserito, numero di pubblicazione più alto).
+        Le pubblicazioni non vengono mai modificate né cancellate, quindi cambia solo con nuovi inserimenti.
+        """
+        with self._connetti() as conn:
+            return conn.execute(WATERMARK_QUERY).fetchone()
+
+    def elenca_pubblicazioni(self, limit, prima_di=None, mittente=None, tipo_atto=None):
+        """Pubblicazioni dalla più recente, a partire da quella precedente a `prima_di` (paginazione a chiave)."""
+        where, params = [], []
+        if prima_di is not None:
+            where.append("CAST(numero_pubblicazione AS INTEGER) < ?")
+            params.append(prima_di)
+        if mittente:
+            where.append("mittente = ?")
+            params.append(mittente)
+        if tipo_atto:
+            where.append("tipo_atto = ?")
+            params.append(tipo_atto)
+        query = "SELECT * FROM pubblicazioni"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY CAST(numero_pubblicazione AS INTEGER) DESC LIMIT ?"
+        return self._interroga(query, params + [limit])
+
+    def cerca_pubblicazioni(self, testo, limit, prima_di=None):
+        """Cerca `testo` in oggetto, mittente e tipo dell'atto, dalla pubblicazione più recente."""
+        pattern = "%" + testo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = """
+            SELECT * FROM pubblicazioni
+            WHERE (oggetto_atto LIKE ? ESCAPE '\\' OR mittente LIKE ? ESCAPE '\\' OR tipo_atto LIKE ? ESCAPE '\\')
+        """
+        params = [pattern] * 3
+        if prima_di is not None:
+            query += " AND CAST(numero_pubblicazione AS INTEGER) < ?"
+            params.append(prima_di)
+        query += " ORDER BY CAST(numero_pubblicazione AS INTEGER) DESC LIMIT ?"
+        return self._interroga(query, params + [limit])
+
+    def get_pubblicazione(self, numero_pubblicazione):
+        righe = self._interroga(
+            "SELECT * FROM pubblicazioni WHERE numero_pubblicazione = ?", (numero_pubblicazione,)
+        )
+        return righe[0] if righe else None
+
+    def get_pubblicazioni_dal(self, cursore, limit):
+        """
+        Pubblicazioni salvate dopo `cursore`, in ordine di inserimento (feed incrementale).
+        Il cursore è il rowid e non il numero di pubblicazione: le pubblicazioni non arrivano
+        sempre in ordine di numero (es. dettagli recuperati in un'esecuzione successiva).
+        Le pubblicazioni non vengono mai cancellate: i rowid restano consecutivi e VACUUM,
+        che li rinumera in ordine, non li modifica. Ogni riga riporta il proprio cursore in `_cursore`.
+        """
+        return self._interroga("""
+            SELECT rowid AS _cursore, * FROM pubblicazioni
+            WHERE rowid > ?
+            ORDER BY rowid ASC LIMIT ?
+        """, (cursore, limit))
+
+    def get_aggregati(self):
+        """Conteggi delle pubblicazioni per mittente, per tipo di atto e per mese di inizio pubblicazione."""
+        return {
+            "mittenti": self._interroga("""
+                SELECT mittente AS valore, COUNT(*) AS totale FROM pubblicazioni
+                GROUP BY mittente ORDER BY totale DESC
+            """),
+            "tipi_atto": self._interroga("""
+                SELECT tipo_atto AS valore, COUNT(*) AS totale FROM pubblicazioni
+                GROUP BY tipo_atto ORDER BY totale DESC
+            """),
+            "mesi": self._interroga("""
+                SELECT substr(data_inizio_pubblicazione, 7, 4) || '-' || substr(data_inizio_pubblicazione, 4, 2) AS valore,
+                       COUNT(*) AS totale
+                FROM pubblicazioni
+                WHERE data_inizio_pubblicazione GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]'
+                GROUP BY valore ORDER BY valore
+            """),
+        }
+
+    # ---------------------- PERIODI DI PUBBLICAZIONE ----------------------
+
+    def _interroga_periodi(self, condizione, params):
+        """Pubblicazioni il cui periodo soddisfa `condizione` sull'indice R*Tree, ordinate per data di fine."""
+        return self._interroga(f"""
+            SELECT p.* FROM pubblicazioni_periodi AS r
+            JOIN pubblicazioni AS p ON CAST(p.numero_pubblicazione AS INTEGER) = r.id
+            WHERE {condizione}
+            ORDER BY r.fine, CAST(p.numero_pubblicazione AS INTEGER)
+        """, params)
+
+    def in_pubblicazione_il(self, giorno):
+        """Pubblicazioni affisse all'Albo nel giorno indicato (datetime.date)."""
+        return self._interroga_periodi("r.inizio <= ? AND r.fine >= ?", (giorno.toordinal(), giorno.toordinal()))
+
+    def in_pubblicazione_tra(self, data_da, data_a):
+        """Pubblicazioni il cui periodo si sovrappone all'intervallo [data_da, data_a]."""
+        return self._interroga_periodi("r.inizio <= ? AND r.fine >= ?", (data_a.toordinal(), data_da.toordinal()))
+
+    def in_scadenza(self, giorno, giorni):
+        """Pubblicazioni la cui affissione termina tra `giorno` e i `giorni` successivi (inclusi)."""
+        fine = giorno.toordinal() + giorni
+        return self._interroga_periodi(
+            "r.fine >= ? AND r.fine <= ? AND r.inizio <= ?", (giorno.toordinal(), fine, fine)
+        )
@@ -0,0 +1,77 @@
+import sqlite3
+from config import ISCRIZIONI_DB_NAME, TELEGRAM_ISCRIZIONI
+
+TIPI_REGOLA = ("keyword", "mittente", "tipo_atto")
+
+class IscrizioniManager:
+    """
+    Regole di notifica degli iscritti (chat Telegram), tenute fuori da pubblicazioni.db
+    perché quel file viene pubblicato nel repository.
+
+    Le regole provengono da un database SQLite locale, non versionato, gestito da riga di comando,
+    e dalla variabile d'ambiente TELEGRAM_ISCRIZIONI (una regola per riga: "chat_id;tipo_regola;valore"),
+    pensata per i secret di GitHub Actions.
+    """
+
+    def __init__(self, db_name=ISCRIZIONI_DB_NAME, regole_env=TELEGRAM_ISCRIZIONI):
+        self.db_name = db_name
+        self.regole_env = regole_env
+        self.init_db()
+
+    def init_db(self):
+        with sqlite3.connect(self.db_name) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS iscrizioni (
+                    chat_id TEXT,
+                    tipo_regola TEXT CHECK (tipo_regola IN ('keyword', 'mittente', 'tipo_atto')),
+                    valore TEXT,
+                    PRIMARY KEY (chat_id, tipo_regola, valore)
+                )
+            """)
+            conn.commit()
+
+    def aggiungi_iscrizione(self, chat_id, tipo_regola, valore):
+        """
+        Registra una regola di notifica ('keyword', 'mittente' o 'tipo_atto') per una chat.
+        Restituisce False se la regola era già presente; solleva ValueError se il tipo non è valido.
+        """
+        if tipo_regola not in TIPI_REGOLA:
+            raise ValueError(f"Tipo di regola non valido: {tipo_regola} (ammessi: {', '.join(TIPI_REGOLA)})")
+        try:
+            with sqlite3.connect(self.db_name) as conn:
+                conn.execute(
+                    "INSERT INTO iscrizioni VALUES (?, ?, ?)",
+                    (str(chat_id), tipo_regola, valore.strip())
+                )
+                conn.commit()
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def rimuovi_iscrizione(self, chat_id, tipo_regola=None, valore=None):
+        """Rimuove una regola di una chat, oppure tutte le sue regole se non specificata."""
+        with sqlite3.connect(self.db_name) as conn:
+            if tipo_regola is None:
+                conn.execute("DELETE FROM iscrizioni WHERE chat_id = ?", (str(chat_id),))
+            else:
+                conn.execute(
+                    "DELETE FROM iscrizioni WHERE chat_id = ? AND tipo_regola = ? AND valore = ?",
+                    (str(chat_id), tipo_regola, valore.strip())
+                )
+            conn.commit()
+
+    def _regole_da_env(self):
+        regole = []
+        for riga in (self.regole_env or "").splitlines():
+            parti = [p.strip() for p in riga.split(";", 2)]
+            if len(parti) == 3 and all(parti) and parti[1] in TIPI_REGOLA:
+                regole.append(tuple(parti))
+            elif riga.strip():
+                print(f"⚠️ Regola di iscrizione non valida ignorata: {riga.strip()}")
+        return regole
+
+    def get_iscrizioni(self):
+        with sqlite3.connect(self.db_name) as conn:
+            query = "SELECT chat_id, tipo_regola, valore FROM iscrizioni"
+            data = conn.execute(query).fetchall()
+        return data + self._regole_da_env()
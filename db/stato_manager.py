@@ -0,0 +1,30 @@
+import json
+import os
+from config import STATO_NAME
+
+class StatoManager:
+    """
+    Stato operativo dello scraper (es. data dell'ultimo riepilogo inviato), in un file JSON
+    locale e non versionato, così da non modificare pubblicazioni.db quando non ci sono novità.
+    """
+
+    def __init__(self, path=STATO_NAME):
+        self.path = path
+
+    def _leggi(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get_stato(self, chiave):
+        return self._leggi().get(chiave)
+
+    def set_stato(self, chiave, valore):
+        stato = self._leggi()
+        stato[chiave] = valore
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stato, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,87 @@
+import random
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from config import (
+    TIMEOUT, HTTP_MAX_RETRIES, HTTP_BACKOFF, HTTP_POOL_SIZE,
+    CIRCUIT_THRESHOLD, CIRCUIT_COOLDOWN, RUN_BUDGET
+)
+
+class UpstreamUnavailableError(Exception):
+    """Il server remoto non va interrogato oltre in questa esecuzione."""
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Troppi errori consecutivi: il circuito è aperto."""
+
+class BudgetExceededError(UpstreamUnavailableError):
+    """Il tempo massimo a disposizione per l'esecuzione è esaurito."""
+
+class HttpClient:
+    """
+    Client HTTP condiviso con:
+      - connessioni keep-alive riutilizzate (pool),
+      - nuovi tentativi con backoff esponenziale e jitter su errori 5xx, timeout e connessione,
+      - circuit breaker dopo `soglia_circuito` errori consecutivi,
+      - un budget di tempo complessivo per l'esecuzione.
+    """
+
+    def __init__(self, timeout=TIMEOUT, max_retries=HTTP_MAX_RETRIES, backoff=HTTP_BACKOFF,
+                 soglia_circuito=CIRCUIT_THRESHOLD, pausa_circuito=CIRCUIT_COOLDOWN, budget=RUN_BUDGET):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.soglia_circuito = soglia_circuito
+        self.pausa_circuito = pausa_circuito
+        self.deadline = time.monotonic() + budget if budget else None
+
+        self.errori_consecutivi = 0
+        self.circuito_aperto_fino = 0.0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def tempo_residuo(self):
+        if self.deadline is None:
+            return float("inf")
+        return self.deadline - time.monotonic()
+
+    def _controlla_disponibilita(self):
+        if time.monotonic() < self.circuito_aperto_fino:
+            raise CircuitOpenError(f"circuito aperto dopo {self.errori_consecutivi} errori consecutivi")
+        if self.tempo_residuo() <= 0:
+            raise BudgetExceededError("budget di tempo dell'esecuzione esaurito")
+
+    def _registra_errore(self):
+        self.errori_consecutivi += 1
+        if self.errori_consecutivi >= self.soglia_circuito:
+            self.circuito_aperto_fino = time.monotonic() + self.pausa_circuito
+
+    def get(self, url, **kwargs):
+        """
+        Esegue una GET con i nuovi tentativi previsti.
+        Solleva UpstreamUnavailableError se il circuito è aperto o il budget è esaurito,
+        altrimenti l'ultima eccezione di requests dopo aver esaurito i tentativi.
+        """
+        for tentativo in range(self.max_retries + 1):
+            self._controlla_disponibilita()
+            timeout = min(self.timeout, self.tempo_residuo())
+            try:
+                response = self.session.get(url, timeout=timeout, **kwargs)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                errore = e
+            else:
+                if response.status_code < 500:
+                    # Il server risponde: eventuali errori 4xx non vengono ripetuti
+                    self.errori_consecutivi = 0
+                    response.raise_for_status()
+                    return response
+                errore = requests.HTTPError(f"{response.status_code} per {url}", response=response)
+
+            self._registra_errore()
+            if tentativo == self.max_retries or time.monotonic() < self.circuito_aperto_fino:
+                raise errore
+            # Backoff esponenziale con jitter completo, senza superare il budget residuo
+            pausa = random.uniform(0, self.backoff * 2 ** tentativo)
+            time.sleep(max(0, min(pausa, self.tempo_residuo())))
@@ -1,20 +1,24 @@
 import re
 import requests
 from bs4 import BeautifulSoup
-from config import BASE_URL, ALBO_URL, TIMEOUT
+from config import BASE_URL, ALBO_URL
+from scraper.http_client import HttpClient, UpstreamUnavailableError
 
 class AlboParser:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, client=None):
+        self.client = client or HttpClient()
 
     def estrai_dettagli(self, dettagli_link):
+        """
+        Restituisce i dettagli della pubblicazione, oppure None se la pagina non è stata recuperata.
+        Solleva UpstreamUnavailableError se il server non va più interrogato in questa esecuzione.
+        """
         dettagli = {}
         try:
-            response = self.session.get(dettagli_link, timeout=TIMEOUT)
-            response.raise_for_status()
-        except Exception as e:
+            response = self.client.get(dettagli_link)
+        except requests.RequestException as e:
             print(f"Errore nel recupero di {dettagli_link}: {e}")
-            return dettagli
+            return None
 
         try:
             soup = BeautifulSoup(response.text, 'lxml')
@@ -47,10 +51,14 @@ class AlboParser:
         return dettagli
 
     def estrai_pubblicazioni(self):
+        """
+        Restituisce le pubblicazioni dell'Albo con i relativi dettagli.
+        Le pubblicazioni i cui dettagli non sono stati recuperati vengono escluse,
+        così da essere ritentate alla prossima esecuzione invece di salvarle incomplete.
+        """
         try:
-            response = self.session.get(ALBO_URL, timeout=TIMEOUT)
-            response.raise_for_status()
-        except Exception as e:
+            response = self.client.get(ALBO_URL)
+        except (requests.RequestException, UpstreamUnavailableError) as e:
             print("Errore nel recupero dell'Albo:", e)
             return []
 
@@ -71,11 +79,17 @@ class AlboParser:
             if len(cells) < 5:
                 continue
             oggetto_link = cells[1].find("a")
-            if oggetto_link and oggetto_link.has_attr("href"):
-                dettagli_link = BASE_URL[:-1] + oggetto_link["href"]
-            else:
-                dettagli_link = "#"
-            dettagli_pubblicazione = self.estrai_dettagli(dettagli_link)
+            if not (oggetto_link and oggetto_link.has_attr("href")):
+                continue
+            dettagli_link = BASE_URL[:-1] + oggetto_link["href"]
+            try:
+                dettagli_pubblicazione = self.estrai_dettagli(dettagli_link)
+            except UpstreamUnavailableError as e:
+                print(f"⚠️ Interruzione del recupero dei dettagli: {e}")
+                break
+            if not dettagli_pubblicazione or not dettagli_pubblicazione.get("Numero pubblicazione"):
+                print(f"⚠️ Dettagli incompleti per {dettagli_link}: verranno ritentati alla prossima esecuzione")
+                continue
             pubblicazione = {
                 "numero_pubblicazione": dettagli_pubblicazione.get("Numero pubblicazione", "N/A"),
                 "mittente": dettagli_pubblicazione.get("Mittente", "N/A"),
@@ -1,16 +1,23 @@
 import sys
 import os
+from datetime import date
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from apscheduler.schedulers.blocking import BlockingScheduler
+from config import DIGEST_GIORNI
 from db.db_manager import DatabaseManager
+from db.iscrizioni_manager import IscrizioniManager, TIPI_REGOLA
+from db.stato_manager import StatoManager
 from scraper.parser import AlboParser
 from scraper.telegram_notifier import TelegramNotifier
+from scraper.subscriptions import SubscriptionMatcher
 
 def job_monitor():
     db_manager = DatabaseManager()
     parser = AlboParser()
     notifier = TelegramNotifier()
+    # Le regole degli iscritti vengono compilate una sola volta per esecuzione
+    matcher = SubscriptionMatcher(IscrizioniManager().get_iscrizioni())
 
     print("Esecuzione del job di monitoraggio...")
     pubblicazioni = parser.estrai_pubblicazioni()
@@ -25,9 +32,71 @@ def job_monitor():
     for pub in new_pubs:
         db_manager.salva_pubblicazione(pub)
         notifier.invia_messaggio(pub)
+        destinatari = matcher.trova_destinatari(pub)
+        if destinatari:
+            notifier.invia_a_iscritti(pub, destinatari)
+
+    # Aggiorna lo snapshot colonnare letto dalla dashboard (anche se un'esportazione precedente è fallita)
+    if new_pubs or not db_manager.snapshot_aggiornato():
+        db_manager.esporta_snapshot()
+
+    invia_digest_scadenze(db_manager, notifier)
+
+def invia_digest_scadenze(db_manager, notifier, giorni=DIGEST_GIORNI, stato=None):
+    """
+    Invia, al più una volta al giorno, il riepilogo delle pubblicazioni in scadenza.
+    Se un messaggio non viene consegnato, le pubblicazioni già consegnate in giornata vengono
+    registrate e l'esecuzione successiva invia solo le restanti.
+    """
+    stato = stato or StatoManager()
+    giorno = date.today()
+    oggi = giorno.isoformat()
+    if stato.get_stato("ultimo_digest_scadenze") == oggi:
+        return
+
+    parziale = stato.get_stato("digest_scadenze_parziale") or {}
+    gia_consegnate = set(parziale.get("consegnate", [])) if parziale.get("giorno") == oggi else set()
+    pubblicazioni = [
+        p for p in db_manager.in_scadenza(giorno, giorni)
+        if p["numero_pubblicazione"] not in gia_consegnate
+    ]
+    if pubblicazioni:
+        consegnate = notifier.invia_digest_scadenze(pubblicazioni, giorno, giorni)
+        if len(consegnate) < len(pubblicazioni):
+            gia_consegnate.update(consegnate)
+            stato.set_stato("digest_scadenze_parziale", {"giorno": oggi, "consegnate": sorted(gia_consegnate)})
+            print("⚠️ Riepilogo delle scadenze incompleto: il resto verrà inviato alla prossima esecuzione")
+            return
+    stato.set_stato("ultimo_digest_scadenze", oggi)
+
+def gestisci_iscrizione(args):
+    """
+    Gestione delle iscrizioni da riga di comando:
+      --iscrivi <chat_id> <keyword|mittente|tipo_atto> <valore>
+      --disiscrivi <chat_id> [<keyword|mittente|tipo_atto> <valore>]
+    """
+    if len(args) >= 3 and args[2] not in TIPI_REGOLA:
+        print(f"Tipo di regola non valido: {args[2]}")
+        print(gestisci_iscrizione.__doc__)
+        return
+
+    iscrizioni = IscrizioniManager()
+    if args[0] == "--iscrivi" and len(args) >= 4:
+        if iscrizioni.aggiungi_iscrizione(args[1], args[2], " ".join(args[3:])):
+            print("Iscrizione registrata.")
+        else:
+            print("Iscrizione già presente.")
+    elif args[0] == "--disiscrivi" and len(args) >= 4:
+        iscrizioni.rimuovi_iscrizione(args[1], args[2], " ".join(args[3:]))
+    elif args[0] == "--disiscrivi" and len(args) == 2:
+        iscrizioni.rimuovi_iscrizione(args[1])
+    else:
+        print(gestisci_iscrizione.__doc__)
 
 if __name__ == "__main__":
-    if "--once" in sys.argv:
+    if len(sys.argv) > 1 and sys.argv[1] in ("--iscrivi", "--disiscrivi"):
+        gestisci_iscrizione(sys.argv[1:])
+    elif "--once" in sys.argv:
         job_monitor()
     else:
         scheduler = BlockingScheduler()
@@ -0,0 +1,67 @@
+import re
+from collections import defaultdict
+
+def _normalizza(testo):
+    """Porta il testo in minuscolo e compatta gli spazi, per confronti uniformi."""
+    return " ".join(str(testo).lower().split())
+
+class SubscriptionMatcher:
+    """
+    Compila tutte le regole di iscrizione in un'unica espressione regolare,
+    così ogni nuova pubblicazione viene confrontata con tutte le iscrizioni in una sola passata.
+
+    Tipi di regola supportati:
+      - keyword: parola o frase cercata (a parola intera) in oggetto e tipo dell'atto.
+      - mittente / tipo_atto: corrispondenza esatta (senza distinzione di maiuscole).
+    """
+
+    def __init__(self, iscrizioni):
+        self.keywords = defaultdict(set)
+        self.mittenti = defaultdict(set)
+        self.tipi_atto = defaultdict(set)
+
+        for chat_id, tipo_regola, valore in iscrizioni:
+            valore = _normalizza(valore)
+            if not valore:
+                continue
+            if tipo_regola == "keyword":
+                self.keywords[valore].add(chat_id)
+            elif tipo_regola == "mittente":
+                self.mittenti[valore].add(chat_id)
+            elif tipo_regola == "tipo_atto":
+                self.tipi_atto[valore].add(chat_id)
+
+        self.pattern = None
+        if self.keywords:
+            # Alternanza dalla keyword più lunga alla più corta, all'interno di un lookahead:
+            # si ottiene una corrispondenza per ogni posizione, anche se sovrapposta ad altre.
+            alternative = "|".join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+            self.pattern = re.compile(rf"(?=(?<!\w)({alternative})(?!\w))")
+
+        # A parità di posizione l'espressione restituisce solo la keyword più lunga:
+        # ogni keyword eredita quindi gli iscritti delle keyword che ne sono un prefisso a parola intera.
+        self.destinatari_keyword = {}
+        for keyword, chat_ids in self.keywords.items():
+            destinatari = set(chat_ids)
+            for i in range(1, len(keyword)):
+                if not re.match(r"\w", keyword[i]) and keyword[:i] in self.keywords:
+                    destinatari |= self.keywords[keyword[:i]]
+            self.destinatari_keyword[keyword] = destinatari
+
+    def __len__(self):
+        return sum(len(v) for v in (self.keywords, self.mittenti, self.tipi_atto))
+
+    def trova_destinatari(self, pubblicazione):
+        """Restituisce l'insieme delle chat interessate alla pubblicazione."""
+        destinatari = set()
+        destinatari |= self.mittenti.get(_normalizza(pubblicazione.get("mittente", "")), set())
+        destinatari |= self.tipi_atto.get(_normalizza(pubblicazione.get("tipo_atto", "")), set())
+
+        if self.pattern is not None:
+            testo = _normalizza(" ".join(
+                str(pubblicazione.get(campo, "")) for campo in ("oggetto_atto", "tipo_atto")
+            ))
+            for keyword in set(self.pattern.findall(testo)):
+                destinatari |= self.destinatari_keyword[keyword]
+
+        return destinatari
@@ -1,5 +1,10 @@
+import time
 import requests
-from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, TIMEOUT
+from concurrent.futures import ThreadPoolExecutor
+from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, TIMEOUT, TELEGRAM_MAX_WORKERS
+
+# Lunghezza massima di un messaggio Telegram (con margine)
+MAX_MESSAGE_LENGTH = 4000
 
 def escape_markdown(text):
     """Escape minimo: scappa solo i caratteri che causano errori in Markdown."""
@@ -21,6 +26,53 @@ class TelegramNotifier:
 
     def invia_messaggio(self, pubblicazione):
         """Genera e invia il messaggio Telegram formattato."""
+        return self._invia_testo(self.chat_id, self.formatta_messaggio(pubblicazione))
+
+    def invia_a_iscritti(self, pubblicazione, chat_ids, max_workers=TELEGRAM_MAX_WORKERS):
+        """
+        Invia la pubblicazione a tutte le chat indicate, con al più `max_workers` invii concorrenti.
+        Restituisce un dizionario chat_id -> risposta di Telegram ({} in caso di errore).
+        """
+        chat_ids = [c for c in chat_ids if str(c) != str(self.chat_id)]
+        if not chat_ids:
+            return {}
+        testo = self.formatta_messaggio(pubblicazione)
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chat_ids))) as executor:
+            risposte = executor.map(lambda chat_id: self._invia_testo(chat_id, testo), chat_ids)
+            return dict(zip(chat_ids, risposte))
+
+    def invia_digest_scadenze(self, pubblicazioni, giorno, giorni):
+        """
+        Invia il riepilogo delle pubblicazioni che lasciano l'Albo nei prossimi `giorni`,
+        suddiviso in più messaggi se supera la lunghezza massima consentita da Telegram.
+        Si ferma al primo messaggio non consegnato e restituisce i numeri delle pubblicazioni
+        contenute nei messaggi già consegnati.
+        """
+        intestazione = f"⏳ *In scadenza* dal {giorno.strftime('%d/%m/%Y')} nei prossimi {giorni} giorni\n"
+
+        # Ogni messaggio è una coppia (righe, numeri delle pubblicazioni contenute)
+        messaggi, corrente, numeri = [], [intestazione], []
+        for p in pubblicazioni:
+            riga = (
+                f"• *{escape_markdown(p['numero_pubblicazione'])}* ({escape_markdown(p['data_fine_pubblicazione'])}): "
+                f"{escape_markdown(p['oggetto_atto'])}"
+            )
+            if numeri and sum(len(r) + 1 for r in corrente) + len(riga) > MAX_MESSAGE_LENGTH:
+                messaggi.append((corrente, numeri))
+                corrente, numeri = [], []
+            corrente.append(riga)
+            numeri.append(p["numero_pubblicazione"])
+        messaggi.append((corrente, numeri))
+
+        consegnate = []
+        for righe, numeri in messaggi:
+            if not self._invia_testo(self.chat_id, "\n".join(righe)).get("ok"):
+                break
+            consegnate.extend(numeri)
+        return consegnate
+
+    def formatta_messaggio(self, pubblicazione):
+        """Genera il testo Markdown del messaggio per la pubblicazione."""
         
         # Chiavi da escludere dalla pubblicazione
         skip_keys = {
@@ -60,12 +112,13 @@ class TelegramNotifier:
         lines.append("\n🔎 Clicca [QUI](https://acerno.streamlit.app/) per maggiori informazioni.")
 
         # Composizione del messaggio in formato Markdown
-        testo = "\n".join(lines)
+        return "\n".join(lines)
 
-        # Invio del messaggio Telegram
+    def _invia_testo(self, chat_id, testo):
+        """Invia un messaggio Telegram a una chat, rispettando una sola volta l'eventuale attesa richiesta (429)."""
         url = f"https://api.telegram.org/bot{self.token}/sendMessage"
         payload = {
-            "chat_id": self.chat_id,
+            "chat_id": chat_id,
             "text": testo,
             "parse_mode": "Markdown",
             "disable_web_page_preview": True
@@ -73,8 +126,12 @@ class TelegramNotifier:
 
         try:
             response = self.session.post(url, json=payload, timeout=TIMEOUT)
+            if response.status_code == 429:
+                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                time.sleep(min(retry_after, TIMEOUT))
+                response = self.session.post(url, json=payload, timeout=TIMEOUT)
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            print("Errore nell'invio del messaggio Telegram:", e)
+            print(f"Errore nell'invio del messaggio Telegram a {chat_id}:", e)
             return {}
@@ -1,7 +1,16 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+from datetime import timedelta
 from streamlit_echarts import st_echarts
+from common import data_watermark
+from ritardi import compute_ritardi_stats
+
+# Colonne lette dall'archivio per la pagina ANALISI (numero_pubblicazione serve per il watermark)
+ANALISI_COLUMNS = [
+    "numero_pubblicazione", "mittente", "tipo_atto",
+    "data_registro_generale", "data_inizio_pubblicazione"
+]
 
 # ---------------------- FUNZIONE DI PREPARAZIONE DATI ----------------------
 
@@ -14,71 +23,117 @@ ACTIVE_MAPPING = {
     "COMUNE DI ACERNO": "Comune di Acerno"
 }
 
-def prepare_time_series_data_by_sender(df: pd.DataFrame, window: int = 30) -> tuple[pd.DataFrame, pd.DataFrame]:
-    """
-    Prepara i dati temporali aggregati per data e mittente,
-    considerando solo i mittenti definiti in ACTIVE_MAPPING.
-    
-    La funzione restituisce due dataset:
-      - daily_dataset: dati giornalieri relativi agli ultimi `window` giorni.
-      - cumulative_dataset: andamento cumulato, che mantiene il valore
-        pregresso aggregato fino al primo giorno della finestra.
-    """
-    import pandas as pd
-    from datetime import timedelta
+# Granularità disponibili per l'andamento temporale (etichetta -> frequenza pandas)
+GRANULARITA = {
+    "Giorno": "D",
+    "Settimana": "W",
+    "Mese": "M"
+}
 
-    # Copia del dataframe e conversione della data con eventuale scarto degli errori
-    df_copy = df.copy()
-    df_copy["data_inizio_pubblicazione"] = pd.to_datetime(df_copy["data_inizio_pubblicazione"], errors="coerce")
-    df_copy = df_copy.dropna(subset=["data_inizio_pubblicazione"])
-    # Mantiene la data senza l'orario, come tipo date
-    df_copy["data"] = df_copy["data_inizio_pubblicazione"].dt.date
+# Aggettivo usato nei titoli dei grafici per ciascuna granularità
+TITOLI_GRANULARITA = {
+    "Giorno": "Giornaliero",
+    "Settimana": "Settimanale",
+    "Mese": "Mensile"
+}
 
-    # Filtra per includere solo i mittenti definiti in ACTIVE_MAPPING
-    df_copy = df_copy[df_copy["mittente"].isin(ACTIVE_MAPPING.keys())]
+# Solo lo stato dei dati corrente (e il precedente, durante un aggiornamento) resta in cache
+@st.cache_data(show_spinner=False, max_entries=2)
+def build_cumulative_counts(_df: pd.DataFrame, watermark) -> tuple[pd.Timestamp, np.ndarray]:
+    """
+    Costruisce l'array delle somme prefisse dei conteggi giornalieri per mittente,
+    considerando solo i mittenti definiti in ACTIVE_MAPPING.
 
-    # Costruisce la tabella pivot: righe=giorni, colonne=mittenti, conteggio degli eventi
-    pivot = df_copy.pivot_table(index="data", columns="mittente", aggfunc="size", fill_value=0).sort_index()
-    # Aggiunge la colonna TOTAL = somma per ogni giorno
-    pivot["TOTAL"] = pivot.sum(axis=1)
-    pivot = pivot.applymap(int)  # per avere tipi Python nativi
+    Viene calcolato una sola volta per ogni stato dei dati (`watermark`) e restituisce:
+      - first_day: il primo giorno con pubblicazioni.
+      - prefix: matrice (giorni + 1) x (mittenti + 1) in cui prefix[i] contiene il numero
+        di pubblicazioni precedenti al giorno first_day + i; l'ultima colonna è il totale.
+    Il conteggio di un qualsiasi intervallo si ottiene così con due accessi all'array.
+    """
+    dates = pd.to_datetime(_df["data_inizio_pubblicazione"], errors="coerce", dayfirst=True)
+    senders = _df["mittente"].astype(str)
+    mask = dates.notna() & senders.isin(ACTIVE_MAPPING.keys())
+    dates = dates[mask].dt.normalize()
+    senders = senders[mask]
+
+    if dates.empty:
+        return None, np.zeros((1, len(ACTIVE_MAPPING) + 1), dtype=np.int64)
+
+    first_day = dates.min()
+    day_idx = (dates - first_day).dt.days.to_numpy()
+    sender_idx = senders.map({s: i for i, s in enumerate(ACTIVE_MAPPING)}).to_numpy()
+
+    # Conteggi giornalieri: righe=giorni, colonne=mittenti
+    counts = np.zeros((day_idx.max() + 1, len(ACTIVE_MAPPING)), dtype=np.int64)
+    np.add.at(counts, (day_idx, sender_idx), 1)
+
+    # Aggiunge la colonna del totale e calcola le somme prefisse (con una riga iniziale a zero)
+    counts = np.column_stack([counts, counts.sum(axis=1)])
+    prefix = np.zeros((counts.shape[0] + 1, counts.shape[1]), dtype=np.int64)
+    np.cumsum(counts, axis=0, out=prefix[1:])
+    return first_day, prefix
+
+def _bucket_bounds(data_da: pd.Timestamp, data_a: pd.Timestamp, granularita: str) -> tuple[pd.DatetimeIndex, pd.DatetimeIndex]:
+    """
+    Suddivide l'intervallo [data_da, data_a] in periodi della granularità richiesta.
+    Restituisce gli estremi (inclusi) di ciascun periodo; il primo e l'ultimo
+    periodo vengono troncati agli estremi dell'intervallo.
+    """
+    periods = pd.period_range(data_da, data_a, freq=GRANULARITA[granularita])
+    starts = periods.start_time.normalize().where(periods.start_time >= data_da, data_da)
+    ends = periods.end_time.normalize().where(periods.end_time <= data_a, data_a)
+    return pd.DatetimeIndex(starts), pd.DatetimeIndex(ends)
 
-    # Creazione del dizionario per il rename
-    rename_dict = {"TOTAL": "TOTALE"}
-    for sender in ACTIVE_MAPPING:
-        rename_dict[sender] = ACTIVE_MAPPING[sender]
+def _prefix_at(prefix: np.ndarray, first_day: pd.Timestamp, days: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Restituisce le righe di `prefix` corrispondenti all'inizio di ciascun giorno in `days`
+    (giorni fuori dall'intervallo dei dati vengono riportati agli estremi).
+    """
+    positions = np.clip((days - first_day).days.to_numpy(), 0, prefix.shape[0] - 1)
+    return prefix[positions]
 
+def prepare_time_series_data_by_sender(df: pd.DataFrame, window: int = 30, data_da=None, data_a=None,
+                                       granularita: str = "Giorno", watermark=None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Prepara i dati temporali aggregati per periodo e mittente,
+    considerando solo i mittenti definiti in ACTIVE_MAPPING.
+    
+    La funzione restituisce due dataset:
+      - daily_dataset: conteggi per ogni periodo (giorno, settimana o mese) tra `data_da` e `data_a`.
+      - cumulative_dataset: andamento cumulato, che include il valore
+        pregresso aggregato fino al primo giorno dell'intervallo.
+    Se l'intervallo non è indicato vengono usati gli ultimi `window` giorni disponibili.
+    """
     # Ordine finale delle colonne
     final_order = ["data"] + [ACTIVE_MAPPING[s] for s in ACTIVE_MAPPING] + ["TOTALE"]
 
-    # Calcola il cumulato su tutto il dataset (l'andamento cumulato include dati pregressi)
-    cumulative_pivot = pivot.cumsum()
-
-    # Definisce l'intervallo degli ultimi 'window' giorni
-    # Se non ci sono dati sufficienti, verranno mostrati quelli disponibili
-    if pivot.empty:
-        return pd.DataFrame(), pd.DataFrame()
-    
-    # Trova l'ultimo giorno disponibile nel dataset
-    last_date = pivot.index.max()
-    # Calcola la soglia: includiamo window giorni compreso l'ultimo
-    threshold_date = last_date - timedelta(days=window - 1)
-
-    # Filtra sia i dati giornalieri che quelli cumulativi in base alla finestra
-    pivot_filtered = pivot.loc[threshold_date:last_date].reset_index()
-    cumulative_filtered = cumulative_pivot.loc[threshold_date:last_date].reset_index()
-
-    # Rinomina le colonne
-    daily_dataset = pivot_filtered.rename(columns=rename_dict)
-    cumulative_dataset = cumulative_filtered.rename(columns=rename_dict)
-
-    # Format della colonna data in stringa con formato "dd-mm-yyyy"
-    daily_dataset["data"] = daily_dataset["data"].apply(lambda d: d.strftime("%d-%m-%Y"))
-    cumulative_dataset["data"] = cumulative_dataset["data"].apply(lambda d: d.strftime("%d-%m-%Y"))
-
-    # Riordina le colonne come da final_order
-    daily_dataset = daily_dataset[final_order]
-    cumulative_dataset = cumulative_dataset[final_order]
+    if watermark is None:
+        watermark = data_watermark(df)
+    first_day, prefix = build_cumulative_counts(df, watermark)
+    if first_day is None:
+        return pd.DataFrame(columns=final_order), pd.DataFrame(columns=final_order)
+
+    # Definisce l'intervallo: di default gli ultimi 'window' giorni, compreso l'ultimo
+    last_day = first_day + pd.Timedelta(days=prefix.shape[0] - 2)
+    data_a = pd.Timestamp(data_a) if data_a else last_day
+    data_da = pd.Timestamp(data_da) if data_da else data_a - pd.Timedelta(days=window - 1)
+    if data_da > data_a:
+        return pd.DataFrame(columns=final_order), pd.DataFrame(columns=final_order)
+
+    # Ogni periodo richiede solo due accessi all'array delle somme prefisse
+    starts, ends = _bucket_bounds(data_da, data_a, granularita)
+    before = _prefix_at(prefix, first_day, starts)
+    cumulative = _prefix_at(prefix, first_day, ends + pd.Timedelta(days=1))
+    daily = cumulative - before
+
+    # Format della colonna data in stringa ("dd-mm-yyyy", oppure "mm-yyyy" per i mesi)
+    date_format = "%m-%Y" if granularita == "Mese" else "%d-%m-%Y"
+    labels = starts.strftime(date_format)
+
+    daily_dataset = pd.DataFrame(daily.tolist(), columns=final_order[1:])
+    cumulative_dataset = pd.DataFrame(cumulative.tolist(), columns=final_order[1:])
+    daily_dataset.insert(0, "data", labels)
+    cumulative_dataset.insert(0, "data", labels)
 
     return daily_dataset, cumulative_dataset
 
@@ -89,7 +144,7 @@ def prepare_mittenti_count(df: pd.DataFrame, selected_senders: list, mapping: di
     Prepara un DataFrame con il conteggio delle pubblicazioni per ogni mittente mappato.
     """
     df_copy = df.copy()
-    df_copy["sender_mapped"] = df_copy["mittente"].apply(lambda s: mapping.get(s, "Altri"))
+    df_copy["sender_mapped"] = df_copy["mittente"].astype(str).map(lambda s: mapping.get(s, "Altri"))
     filtered_df = df_copy[df_copy["sender_mapped"].isin(selected_senders)]
     counts = filtered_df["sender_mapped"].value_counts().reset_index()
     counts.columns = ["label", "value"]
@@ -105,48 +160,28 @@ def prepare_tipologie_count(df: pd.DataFrame) -> pd.DataFrame:
 
 # ------------------------Ritardi----------------------------
 
-def prepare_ritardi_metrics(df: pd.DataFrame, mapping: dict = ACTIVE_MAPPING) -> pd.DataFrame:
+def prepare_ritardi_metrics(df: pd.DataFrame, mapping: dict = ACTIVE_MAPPING, watermark=None) -> pd.DataFrame:
     """
     Prepara una tabella con per ogni mittente:
-      - Ritardo medio (in giorni)
+      - Ritardo medio, mediano, 90° e 99° percentile (in giorni)
       - Ritardo massimo (in giorni)
       - Totale delle pubblicazioni
       - Numero di pubblicazioni che hanno raggiunto il ritardo massimo
     La tabella viene ordinata in ordine decrescente in base al ritardo medio.
     """
-    df_copy = df.copy()
-    df_copy["data_registro_generale"] = pd.to_datetime(df_copy["data_registro_generale"], errors="coerce")
-    df_copy["data_inizio_pubblicazione"] = pd.to_datetime(df_copy["data_inizio_pubblicazione"], errors="coerce")
-    df_copy = df_copy.dropna(subset=["data_registro_generale", "data_inizio_pubblicazione"])
-    
-    # Calcola il ritardo in giorni
-    df_copy["ritardo"] = (df_copy["data_inizio_pubblicazione"] - df_copy["data_registro_generale"]).dt.days
-    
-    # Applica il mapping e filtra solo i mittenti definiti
-    df_copy["sender_mapped"] = df_copy["mittente"].apply(lambda s: mapping.get(s, "Altri"))
-    df_copy = df_copy[df_copy["mittente"].isin(mapping.keys())]
-    
-    # Raggruppa per mittente e calcola i valori
-    agg = df_copy.groupby("sender_mapped")["ritardo"].agg(["mean", "max", "count"]).reset_index()
-    agg = agg.rename(columns={
-        "mean": "ritardo_medio", 
-        "max": "ritardo_massimo", 
-        "count": "totale_pubblicazioni"
-    })
-    
-    # Calcolo: numero di pubblicazioni con ritardo massimo
-    def count_max_delay(sub_df):
-        max_delay = sub_df["ritardo"].max()
-        return (sub_df["ritardo"] == max_delay).sum()
-    
-    max_counts = df_copy.groupby("sender_mapped").apply(count_max_delay).reset_index(name="pubblicazioni_max_ritardo")
-    result = pd.merge(agg, max_counts, on="sender_mapped")
-    result["ritardo_medio"] = result["ritardo_medio"].round(0).astype(int)
-    
-    # Ordina per ritardo medio decrescente
-    result = result.sort_values(by="ritardo_medio", ascending=False)
-    
-    return result
+    if watermark is None:
+        watermark = data_watermark(df)
+    metrics, _ = compute_ritardi_stats(df, watermark, mapping)
+    return metrics
+
+def prepare_ritardi_trend(df: pd.DataFrame, mapping: dict = ACTIVE_MAPPING, watermark=None) -> pd.DataFrame:
+    """
+    Prepara l'andamento mensile del ritardo medio: una riga per mese e una colonna per mittente.
+    """
+    if watermark is None:
+        watermark = data_watermark(df)
+    _, trend = compute_ritardi_stats(df, watermark, mapping)
+    return trend
 
 # ---------------------- CONFIGURAZIONE DEI GRAFICI ----------------------
 
@@ -299,11 +334,41 @@ def create_combo_chart_ritardi(data: pd.DataFrame) -> dict:
 def display_temporal_tab(container, df: pd.DataFrame):
     """
     Visualizza i grafici temporali. La multiselect è rimossa e il filtro dei dati è tramite la legenda.
+    L'utente può scegliere l'intervallo di date e la granularità (giorno, settimana, mese).
     """
-    daily_data, cumulative_data = prepare_time_series_data_by_sender(df)
+    watermark = data_watermark(df)
+    first_day, prefix = build_cumulative_counts(df, watermark)
+    if first_day is None:
+        st.info("Nessuna pubblicazione disponibile per l'andamento temporale.")
+        return
+
+    # Selezione dell'intervallo di date e della granularità (di default gli ultimi 30 giorni)
+    last_day = (first_day + pd.Timedelta(days=prefix.shape[0] - 2)).date()
+    default_da = max(first_day.date(), last_day - timedelta(days=29))
+    col_range, col_gran = st.columns([2, 1])
+    intervallo = col_range.date_input(
+        "Intervallo",
+        (default_da, last_day),
+        min_value=first_day.date(),
+        max_value=last_day,
+        key="analisi_intervallo"
+    )
+    granularita = col_gran.radio("Granularità", list(GRANULARITA), horizontal=True, key="analisi_granularita")
+
+    # Durante la selezione dell'intervallo il widget restituisce solo la data iniziale
+    if isinstance(intervallo, (tuple, list)):
+        data_da = intervallo[0] if intervallo else default_da
+        data_a = intervallo[1] if len(intervallo) > 1 else last_day
+    else:
+        data_da, data_a = intervallo, last_day
+
+    daily_data, cumulative_data = prepare_time_series_data_by_sender(
+        df, data_da=data_da, data_a=data_a, granularita=granularita, watermark=watermark
+    )
 
     # Grafico solo per Totale (senza mittenti)
-    total_daily_chart = crea_config_chart("Andamento Totale Giornaliero", daily_data[["data", "TOTALE"]], ["data", "TOTALE"])
+    titolo_periodo = TITOLI_GRANULARITA[granularita]
+    total_daily_chart = crea_config_chart(f"Andamento Totale {titolo_periodo}", daily_data[["data", "TOTALE"]], ["data", "TOTALE"])
     total_cumulative_chart = crea_config_chart("Andamento Totale Cumulato", cumulative_data[["data", "TOTALE"]], ["data", "TOTALE"])
 
     # Grafico diversificato per mittente (senza il Totale)
@@ -311,15 +376,15 @@ def display_temporal_tab(container, df: pd.DataFrame):
     selected_cols = ["data"] + available_cols  # Aggiungiamo "data" come prima colonna per entrambi i grafici
 
     # Creazione dei grafici per mittenti
-    sender_daily_chart = crea_config_chart("Andamento Mittenti Giornaliero", daily_data[selected_cols], selected_cols)
+    sender_daily_chart = crea_config_chart(f"Andamento Mittenti {titolo_periodo}", daily_data[selected_cols], selected_cols)
     sender_cumulative_chart = crea_config_chart("Andamento Mittenti Cumulato", cumulative_data[selected_cols], selected_cols)
 
     # Selezione del radiobutton per il grafico
-    selected_label = st.radio("Seleziona l'andamento", ["Andamento giornaliero", "Andamento cumulato"], horizontal=True)
+    selected_label = st.radio("Seleziona l'andamento", ["Andamento per periodo", "Andamento cumulato"], horizontal=True)
 
     with st.container():
-        if selected_label == "Andamento giornaliero":
-            # Mostriamo i grafici per l'andamento giornaliero
+        if selected_label == "Andamento per periodo":
+            # Mostriamo i grafici per l'andamento per periodo
             st_echarts(options=sender_daily_chart, key="sender_daily_chart", height="400px")
             st_echarts(options=total_daily_chart, key="total_daily_chart", height="400px")
         elif selected_label == "Andamento cumulato":
@@ -355,34 +420,44 @@ def display_ritardi_tab(container, df: pd.DataFrame):
       - La tabella ordinata dei ritardi per mittente.
       - Il grafico a dispersione (scatter plot).
       - Il grafico combinato (combo chart).
-    Con un radiobutton per selezionare "Tabella" o "Grafici".
+      - L'andamento mensile del ritardo medio per mittente.
+    Con un radiobutton per selezionare "Tabella", "Grafico" o "Andamento mensile".
     """
     with container:
         
         # Radiobutton per scegliere la visualizzazione
         view_option = st.radio(
             "Visualizza:",
-            ["Tabella", "Grafico"],
+            ["Tabella", "Grafico", "Andamento mensile"],
             horizontal=True,
             key="ritardi_view"
         )
         
-        # Prepara i dati
-        metrics_df = prepare_ritardi_metrics(df)
+        # Prepara i dati (calcolati una sola volta per stato dei dati)
+        watermark = data_watermark(df)
+        metrics_df = prepare_ritardi_metrics(df, watermark=watermark)
         
         if view_option == "Tabella":
             # Per rinominare correttamente, resettiamo l'indice e rinominiamo la colonna
             metrics_df = metrics_df.rename(columns={
                 "sender_mapped": "Mittente",
                 "ritardo_medio": "Ritardo medio",
+                "ritardo_mediano": "Ritardo mediano",
+                "ritardo_p90": "Ritardo p90",
+                "ritardo_p99": "Ritardo p99",
                 "ritardo_massimo": "Ritardo massimo",
                 "totale_pubblicazioni": "Pubblicazioni",
                 "pubblicazioni_max_ritardo": "Pubb. max ritardo"
             })
             st.dataframe(metrics_df.style.hide())
-        else:  # "Grafici"
+        elif view_option == "Grafico":
             combo_chart_config = create_combo_chart_ritardi(metrics_df)
             st_echarts(options=combo_chart_config, height="400px", key="ritardi_combo_chart")
+        else:  # "Andamento mensile"
+            trend_df = prepare_ritardi_trend(df, watermark=watermark)
+            trend_cols = trend_df.columns.tolist()
+            trend_chart_config = crea_config_chart("Ritardo medio mensile", trend_df, trend_cols)
+            st_echarts(options=trend_chart_config, height="400px", key="ritardi_trend_chart")
 
 # ---------------------- FUNZIONE PRINCIPALE ----------------------
 
@@ -2,7 +2,7 @@ import streamlit as st
 from common import load_data
 from sfoglia import page_sfoglia
 from elenco import page_elenco
-from analisi import page_analisi
+from analisi import page_analisi, ANALISI_COLUMNS
 
 # Sidebar chiusa di default su mobile
 st.set_page_config(page_title="Albo Pretorio", layout="wide", initial_sidebar_state="collapsed")
@@ -10,13 +10,11 @@ st.set_page_config(page_title="Albo Pretorio", layout="wide", initial_sidebar_st
 # Barra di navigazione
 menu = st.sidebar.radio("Seleziona una pagina:", ["📖 SFOGLIA", "📋 ELENCO", "📊 ANALISI"])
 
-df = load_data()
-
-# Richiama la pagina selezionata
+# Richiama la pagina selezionata, leggendo solo le colonne che le servono
 if menu == "📖 SFOGLIA":
-    page_sfoglia(df)
+    page_sfoglia(load_data())
 elif menu == "📋 ELENCO":
-    page_elenco(df)
+    page_elenco(load_data())
 elif menu == "📊 ANALISI":
-    page_analisi(df)
+    page_analisi(load_data(columns=ANALISI_COLUMNS))
 
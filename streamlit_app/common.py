@@ -1,22 +1,262 @@
+import json
+import os
 import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
+import streamlit as st
 
-def load_data():
-    conn = sqlite3.connect("pubblicazioni.db")
-    query = "SELECT * FROM pubblicazioni"
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # senza pyarrow si legge sempre da SQLite
+    pq = None
+
+DB_PATH = "pubblicazioni.db"
+SNAPSHOT_PATH = "pubblicazioni.parquet"
+
+# Colonne con tipo dedicato (come nello snapshot Parquet scritto dallo scraper)
+DATE_COLUMNS = ["data_registro_generale", "data_inizio_pubblicazione", "data_fine_pubblicazione"]
+CATEGORY_COLUMNS = ["mittente", "tipo_atto"]
+
+# Watermark del database salvato dallo scraper nei metadati dello snapshot (come in db_manager)
+SNAPSHOT_WATERMARK_KEY = b"albo_watermark"
+WATERMARK_QUERY = "SELECT MAX(rowid), MAX(CAST(numero_pubblicazione AS INTEGER)) FROM pubblicazioni"
+
+def _snapshot_aggiornato():
+    """
+    Verifica che lo snapshot Parquet descriva gli stessi dati del database, confrontando
+    il watermark salvato nei suoi metadati con quello attuale (una sola query su indici).
+    Senza database lo snapshot è l'unica sorgente e viene considerato valido.
+    """
+    if not os.path.exists(SNAPSHOT_PATH):
+        return False
+    if not os.path.exists(DB_PATH):
+        return True
+    metadata = pq.read_schema(SNAPSHOT_PATH).metadata or {}
+    if SNAPSHOT_WATERMARK_KEY not in metadata:
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+        try:
+            watermark = list(conn.execute(WATERMARK_QUERY).fetchone())
+        finally:
+            conn.close()
+    except sqlite3.Error:  # database illeggibile: lo snapshot resta l'unica sorgente utilizzabile
+        return True
+    return json.loads(metadata[SNAPSHOT_WATERMARK_KEY]) == watermark
+
+def load_data(columns=None):
+    """
+    Carica le pubblicazioni (solo le colonne richieste, se indicate).
+    Legge lo snapshot Parquet in memory-map quando è disponibile e allineato al database,
+    altrimenti il database SQLite (così dashboard ed esportazione vedono gli stessi dati);
+    in entrambi i casi le date sono datetime e mittente/tipo atto sono categorie.
+    """
+    if pq is not None and _snapshot_aggiornato():
+        table = pq.read_table(SNAPSHOT_PATH, columns=columns, memory_map=True)
+        return table.to_pandas(date_as_object=False)
+
+    conn = sqlite3.connect(DB_PATH)
+    select = ", ".join(columns) if columns else "*"
+    query = f"SELECT {select} FROM pubblicazioni"
     df = pd.read_sql(query, conn)
     conn.close()
-    
+
+    for col in DATE_COLUMNS:
+        if col in df:
+            df[col] = pd.to_datetime(df[col], format="%d/%m/%Y", errors="coerce")
+    for col in CATEGORY_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype("category")
     return df
 
-def filter_data(df, ricerca, tipo_atto, data_da, data_a):
-    filtered = df.copy()
+def data_watermark(df):
+    """
+    Restituisce una chiave che identifica lo stato dei dati caricati:
+    numero di righe e numero di pubblicazione più alto.
+    Cambia solo quando lo scraper salva nuove pubblicazioni.
+    """
+    if df.empty:
+        return (0, None)
+    numeri = pd.to_numeric(df["numero_pubblicazione"], errors="coerce")
+    massimo = numeri.max()
+    return (len(df), None if pd.isna(massimo) else int(massimo))
+
+# Data "gg/mm/aaaa" convertita in "aaaa-mm-gg" per i confronti in SQL
+_SQL_DATA_ISO = "substr({col}, 7, 4) || '-' || substr({col}, 4, 2) || '-' || substr({col}, 1, 2)"
+_SQL_DATA_VALIDA = "{col} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]'"
+
+def _contiene(valore, ricerca):
+    """
+    Funzione SQL `contiene(valore, ricerca)`: ricerca (già in minuscolo) contenuta nel valore,
+    senza distinzione di maiuscole anche per le lettere accentate, come il filtro a video.
+    LIKE di SQLite ignora le maiuscole solo per i caratteri ASCII.
+    """
+    return valore is not None and ricerca in str(valore).lower()
+
+def filter_query(ricerca, tipo_atto, data_da, data_a, columns=None):
+    """
+    Costruisce la query SQL equivalente a filter_data (ordinata per numero pubblicazione decrescente).
+    Restituisce la coppia (query, parametri).
+    """
+    colonne_ricerca = [
+        "numero_pubblicazione", "mittente", "tipo_atto", "registro_generale", "data_registro_generale",
+        "oggetto_atto", "data_inizio_pubblicazione", "data_fine_pubblicazione", "documento_principale", "allegati"
+    ]
+    where, params = [], []
+    ricerca = (ricerca or "").strip().lower()
     if ricerca:
-        filtered = filtered[filtered.apply(lambda row: row.astype(str).str.contains(ricerca, case=False, na=False).any(), axis=1)]
+        # Richiede la funzione `contiene`, registrata sulla connessione da iter_filtered_rows
+        where.append("(" + " OR ".join(f"contiene({col}, ?)" for col in colonne_ricerca) + ")")
+        params.extend([ricerca] * len(colonne_ricerca))
     if tipo_atto and tipo_atto != "Tutti":
-        filtered = filtered[filtered["tipo_atto"] == tipo_atto]
+        where.append("tipo_atto = ?")
+        params.append(tipo_atto)
     if data_da:
-        filtered = filtered[pd.to_datetime(filtered["data_inizio_pubblicazione"]) >= pd.to_datetime(data_da)]
+        col = "data_inizio_pubblicazione"
+        where.append(f"{_SQL_DATA_VALIDA.format(col=col)} AND {_SQL_DATA_ISO.format(col=col)} >= ?")
+        params.append(pd.Timestamp(data_da).strftime("%Y-%m-%d"))
     if data_a:
-        filtered = filtered[pd.to_datetime(filtered["data_fine_pubblicazione"]) <= pd.to_datetime(data_a)]
-    return filtered
+        col = "data_fine_pubblicazione"
+        where.append(f"{_SQL_DATA_VALIDA.format(col=col)} AND {_SQL_DATA_ISO.format(col=col)} <= ?")
+        params.append(pd.Timestamp(data_a).strftime("%Y-%m-%d"))
+
+    select = ", ".join(columns) if columns else "*"
+    query = f"SELECT {select} FROM pubblicazioni"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY CAST(numero_pubblicazione AS INTEGER) DESC"
+    return query, params
+
+def iter_filtered_rows(ricerca, tipo_atto, data_da, data_a, columns=None, chunk_size=500):
+    """
+    Legge da SQLite le pubblicazioni filtrate a blocchi di `chunk_size` righe,
+    senza caricare l'intero archivio in memoria.
+    Restituisce un generatore di coppie (nomi delle colonne, righe del blocco).
+    """
+    query, params = filter_query(ricerca, tipo_atto, data_da, data_a, columns)
+    conn = sqlite3.connect(DB_PATH)
+    conn.create_function("contiene", 2, _contiene, deterministic=True)
+    try:
+        cursor = conn.execute(query, params)
+        nomi = [d[0] for d in cursor.description]
+        while True:
+            righe = cursor.fetchmany(chunk_size)
+            if not righe:
+                break
+            yield nomi, righe
+    finally:
+        conn.close()
+
+# ---------------------- CACHE DEI RISULTATI FILTRATI ----------------------
+
+FILTER_CACHE_SIZE = 128  # combinazioni di filtri mantenute in cache
+
+class FilterCache:
+    """
+    Cache LRU, condivisa tra le sessioni, delle posizioni delle righe filtrate e ordinate.
+    Le chiavi sono tuple (ricerca, tipo_atto, data_da, data_a, watermark).
+    """
+
+    def __init__(self, max_size=FILTER_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, positions):
+        with self._lock:
+            self._entries[key] = positions
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def trova_base(self, key):
+        """
+        Cerca il risultato in cache da cui raffinare `key`: stessi filtri e una ricerca
+        contenuta in quella nuova (i suoi risultati includono quindi quelli cercati).
+        Tra i candidati sceglie la ricerca più lunga, cioè il risultato più piccolo.
+        """
+        ricerca, *altri = key
+        with self._lock:
+            candidati = [
+                (k[0], positions) for k, positions in self._entries.items()
+                if list(k[1:]) == altri and k[0] in ricerca
+            ]
+        if not candidati:
+            return None
+        return max(candidati, key=lambda c: len(c[0]))[1]
+
+@st.cache_resource
+def get_filter_cache():
+    return FilterCache()
+
+@st.cache_resource(max_entries=2)
+def _search_index(_df, watermark):
+    """
+    Prepara, una volta per stato dei dati, l'ordinamento per numero di pubblicazione decrescente
+    e il testo in minuscolo di ogni riga (campi separati) su cui eseguire la ricerca.
+    """
+    # Ordinamento numerico, come l'API (i numeri non validi finiscono in fondo)
+    numeri = pd.to_numeric(_df["numero_pubblicazione"], errors="coerce").to_numpy(dtype=float)
+    order = np.argsort(-np.nan_to_num(numeri, nan=-np.inf), kind="stable")
+    campi = []
+    for col in _df.columns:
+        valori = _df[col]
+        if col in DATE_COLUMNS and pd.api.types.is_datetime64_any_dtype(valori):
+            valori = valori.dt.strftime("%d/%m/%Y")
+        campi.append(valori.astype(object).fillna("").astype(str).str.lower())
+    testo = campi[0].str.cat(campi[1:], sep="\x1f")
+    return order, testo.to_numpy(dtype=object)
+
+def filter_positions(df, ricerca, tipo_atto, data_da, data_a, watermark=None):
+    """
+    Restituisce le posizioni (per df.iloc) delle righe che soddisfano i filtri,
+    ordinate per numero di pubblicazione decrescente.
+
+    I risultati sono mantenuti in una cache LRU condivisa: una combinazione già vista
+    non viene ricalcolata, e una ricerca che estende una precedente viene raffinata
+    a partire dal risultato in cache invece che dall'intero archivio.
+    """
+    if watermark is None:
+        watermark = data_watermark(df)
+    ricerca = (ricerca or "").strip().lower()
+    tipo_atto = tipo_atto if tipo_atto and tipo_atto != "Tutti" else None
+    key = (ricerca, tipo_atto, data_da, data_a, watermark)
+
+    cache = get_filter_cache()
+    positions = cache.get(key)
+    if positions is not None:
+        return positions
+
+    order, testo = _search_index(df, watermark)
+    base = cache.trova_base(key)
+    if base is None:
+        # Nessun risultato da raffinare: si applicano i filtri su tipo e date all'intero archivio
+        mask = np.ones(len(df), dtype=bool)
+        if tipo_atto:
+            mask &= (df["tipo_atto"] == tipo_atto).to_numpy()
+        if data_da:
+            mask &= (pd.to_datetime(df["data_inizio_pubblicazione"]) >= pd.to_datetime(data_da)).to_numpy()
+        if data_a:
+            mask &= (pd.to_datetime(df["data_fine_pubblicazione"]) <= pd.to_datetime(data_a)).to_numpy()
+        base = order[mask[order]]
+        cache.put(("",) + key[1:], base)
+
+    positions = base
+    if ricerca:
+        # Il sottoinsieme di un risultato ordinato resta ordinato
+        positions = base[np.fromiter((ricerca in t for t in testo[base]), dtype=bool, count=len(base))]
+    cache.put(key, positions)
+    return positions
+
+def filter_data(df, ricerca, tipo_atto, data_da, data_a):
+    """Restituisce le righe filtrate, ordinate per numero di pubblicazione decrescente."""
+    return df.iloc[filter_positions(df, ricerca, tipo_atto, data_da, data_a)]
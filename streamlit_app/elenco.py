@@ -1,6 +1,7 @@
 import pandas as pd
 import streamlit as st
 from common import filter_data  # Assicurati che questa importazione funzioni correttamente
+from esporta import esporta, formati_disponibili, nome_esportazione
 
 def page_elenco(df):
     st.header("📋 ELENCO")
@@ -17,12 +18,26 @@ def page_elenco(df):
         data_a = col_date2.date_input("Data fine", None)
 
     # **Filtriamo i dati automaticamente**
-    filtered = filter_data(df, ricerca, tipo_atto, data_da, data_a)
-    filtered = filtered.sort_values("numero_pubblicazione", ascending=False)
+    filtered = filter_data(df, ricerca, tipo_atto, data_da, data_a)  # già ordinati per numero decrescente
 
     if filtered.empty:
         st.info("Nessuna pubblicazione trovata.")
     else:
+        # **Esportazione dei risultati filtrati (letti da SQLite a blocchi)**
+        with st.expander("⬇️ Esporta risultati"):
+            col_formato, col_zip = st.columns(2)
+            formato = col_formato.selectbox("Formato", formati_disponibili())
+            includi_allegati = col_zip.checkbox("Includi elenco link di documenti e allegati (ZIP)")
+            nome_file, mime = nome_esportazione(formato, includi_allegati)
+
+            def genera_file():
+                # Eseguita solo al clic su "Scarica": Streamlit conserva in memoria il file
+                # prodotto per servirlo, quindi qui viene letto per intero
+                with esporta(formato, ricerca, tipo_atto, data_da, data_a, includi_allegati) as file:
+                    return file.read()
+
+            st.download_button("Scarica", data=genera_file, file_name=nome_file, mime=mime)
+
         # **Colonne disponibili nel DataFrame**
         available_columns = set(filtered.columns)
 
@@ -59,4 +74,5 @@ def page_elenco(df):
         st.dataframe(
             df_reduced.style.applymap(style_min_width),
             use_container_width=True,
+            column_config={"Data": st.column_config.DateColumn(format="DD/MM/YYYY")},
         )
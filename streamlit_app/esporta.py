@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import zipfile
+from tempfile import SpooledTemporaryFile
+from common import iter_filtered_rows
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # senza openpyxl l'esportazione XLSX non è disponibile
+    Workbook = None
+
+# Oltre questa soglia i file di esportazione vengono spostati su disco
+MAX_MEMORY_BYTES = 8 * 1024 * 1024
+
+# Formato -> (estensione, MIME type)
+FORMATI = {
+    "CSV": ("csv", "text/csv"),
+    "JSONL": ("jsonl", "application/x-ndjson"),
+    "XLSX": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+def formati_disponibili():
+    return [f for f in FORMATI if f != "XLSX" or Workbook is not None]
+
+# ---------------------- SCRITTURA DEI FORMATI ----------------------
+
+def _scrivi_csv(chunks, out):
+    out.write("\ufeff".encode("utf-8"))  # BOM per l'apertura corretta in Excel
+    header_scritto = False
+    for nomi, righe in chunks:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not header_scritto:
+            writer.writerow(nomi)
+            header_scritto = True
+        writer.writerows(righe)
+        out.write(buffer.getvalue().encode("utf-8"))
+
+def _scrivi_jsonl(chunks, out):
+    for nomi, righe in chunks:
+        testo = "".join(json.dumps(dict(zip(nomi, riga)), ensure_ascii=False) + "\n" for riga in righe)
+        out.write(testo.encode("utf-8"))
+
+def _scrivi_xlsx(chunks, out):
+    # In modalità write_only openpyxl non mantiene le righe in memoria
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Pubblicazioni")
+    header_scritto = False
+    for nomi, righe in chunks:
+        if not header_scritto:
+            ws.append(nomi)
+            header_scritto = True
+        for riga in righe:
+            ws.append(list(riga))
+    wb.save(out)
+
+SCRITTORI = {
+    "CSV": _scrivi_csv,
+    "JSONL": _scrivi_jsonl,
+    "XLSX": _scrivi_xlsx,
+}
+
+def _link_allegati(riga):
+    """Restituisce le coppie (tipo, url) del documento principale e degli allegati di una riga."""
+    links = []
+    documento = riga.get("documento_principale")
+    if documento and documento != "N/A":
+        links.append(("documento", documento))
+    allegati = riga.get("allegati") or ""
+    links.extend(("allegato", link.strip()) for link in allegati.split(",") if link.strip())
+    return links
+
+# ---------------------- ESPORTAZIONE ----------------------
+
+def nome_esportazione(formato, includi_allegati=False):
+    """Restituisce la coppia (nome del file, MIME type) dell'esportazione."""
+    if includi_allegati:
+        return "pubblicazioni.zip", "application/zip"
+    estensione, mime = FORMATI[formato]
+    return f"pubblicazioni.{estensione}", mime
+
+def esporta(formato, ricerca, tipo_atto, data_da, data_a, includi_allegati=False):
+    """
+    Esporta le pubblicazioni filtrate (stessi filtri di ELENCO) leggendole da SQLite a blocchi.
+    Con `includi_allegati` produce un archivio ZIP con il file dei dati e
+    l'elenco dei link a documenti e allegati (allegati.csv).
+
+    Il contenuto resta in memoria fino a MAX_MEMORY_BYTES, poi viene spostato su disco.
+    Restituisce il file posizionato all'inizio.
+    """
+    estensione, _ = FORMATI[formato]
+    chunks = iter_filtered_rows(ricerca, tipo_atto, data_da, data_a)
+
+    if not includi_allegati:
+        out = SpooledTemporaryFile(max_size=MAX_MEMORY_BYTES)
+        SCRITTORI[formato](chunks, out)
+        out.seek(0)
+        return out
+
+    # I link vengono raccolti durante la stessa lettura dei dati, in un file temporaneo separato
+    allegati_out = SpooledTemporaryFile(max_size=MAX_MEMORY_BYTES, mode="w+", newline="", encoding="utf-8")
+    allegati_writer = csv.writer(allegati_out)
+    allegati_writer.writerow(["numero_pubblicazione", "oggetto_atto", "tipo", "indice", "url"])
+
+    def chunks_con_allegati():
+        for nomi, righe in chunks:
+            for riga in righe:
+                riga = dict(zip(nomi, riga))
+                for indice, (tipo, url) in enumerate(_link_allegati(riga), start=1):
+                    allegati_writer.writerow([riga["numero_pubblicazione"], riga["oggetto_atto"], tipo, indice, url])
+            yield nomi, righe
+
+    out = SpooledTemporaryFile(max_size=MAX_MEMORY_BYTES)
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(f"pubblicazioni.{estensione}", "w", force_zip64=True) as data_file:
+            SCRITTORI[formato](chunks_con_allegati(), data_file)
+        allegati_out.seek(0)
+        with zf.open("allegati.csv", "w") as allegati_file:
+            for line in allegati_out:
+                allegati_file.write(line.encode("utf-8"))
+    allegati_out.close()
+    out.seek(0)
+    return out
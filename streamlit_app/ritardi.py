@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# ---------------------- STATISTICHE SUI RITARDI ----------------------
+
+def _group_quantile(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """
+    Calcola il quantile `q` di ogni gruppo su un array già ordinato per (gruppo, valore),
+    con interpolazione lineare come np.percentile.
+    """
+    pos = starts + (counts - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+# Solo lo stato dei dati corrente (e il precedente, durante un aggiornamento) resta in cache
+@st.cache_data(show_spinner=False, max_entries=2)
+def compute_ritardi_stats(_df: pd.DataFrame, watermark, mapping: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calcola in un'unica passata vettoriale le statistiche sui ritardi di pubblicazione
+    (giorni tra data del registro generale e inizio pubblicazione) per ogni mittente di `mapping`.
+
+    Il risultato viene calcolato una sola volta per ogni stato dei dati (`watermark`) e comprende:
+      - metrics: ritardo medio, mediano, p90, p99, massimo, totale pubblicazioni e
+        numero di pubblicazioni che hanno raggiunto il ritardo massimo, per mittente.
+      - trend: ritardo medio mensile, una colonna per mittente e una riga per mese.
+    """
+    senders = list(mapping)
+    data_registro = pd.to_datetime(_df["data_registro_generale"], errors="coerce", dayfirst=True)
+    data_inizio = pd.to_datetime(_df["data_inizio_pubblicazione"], errors="coerce", dayfirst=True)
+    codes = _df["mittente"].astype(str).map({s: i for i, s in enumerate(senders)})
+    mask = (data_registro.notna() & data_inizio.notna() & codes.notna()).to_numpy()
+
+    codes = codes.to_numpy()[mask].astype(np.int64)
+    ritardo = (data_inizio - data_registro).dt.days.to_numpy()[mask].astype(np.int64)
+    data_inizio = data_inizio[mask]
+
+    metric_columns = [
+        "sender_mapped", "ritardo_medio", "ritardo_mediano", "ritardo_p90", "ritardo_p99",
+        "ritardo_massimo", "totale_pubblicazioni", "pubblicazioni_max_ritardo"
+    ]
+    if len(codes) == 0:
+        return pd.DataFrame(columns=metric_columns), pd.DataFrame(columns=["data"])
+
+    # Ordina per (mittente, ritardo): ogni gruppo è un blocco contiguo e ordinato
+    order = np.lexsort((ritardo, codes))
+    sorted_ritardo = ritardo[order]
+    counts = np.bincount(codes, minlength=len(senders))
+    present = counts > 0
+    starts = np.cumsum(counts) - counts
+    starts, counts = starts[present], counts[present]
+
+    sums = np.bincount(codes, weights=ritardo, minlength=len(senders))[present]
+    massimi = np.full(len(senders), np.iinfo(np.int64).min)
+    massimi[present] = sorted_ritardo[starts + counts - 1]
+    at_max = np.bincount(codes[ritardo == massimi[codes]], minlength=len(senders))[present]
+
+    metrics = pd.DataFrame({
+        "sender_mapped": [mapping[s] for s, p in zip(senders, present) if p],
+        "ritardo_medio": np.round(sums / counts).astype(int),
+        "ritardo_mediano": np.round(_group_quantile(sorted_ritardo, starts, counts, 0.5)).astype(int),
+        "ritardo_p90": np.round(_group_quantile(sorted_ritardo, starts, counts, 0.9)).astype(int),
+        "ritardo_p99": np.round(_group_quantile(sorted_ritardo, starts, counts, 0.99)).astype(int),
+        "ritardo_massimo": massimi[present],
+        "totale_pubblicazioni": counts,
+        "pubblicazioni_max_ritardo": at_max
+    }).sort_values(by="ritardo_medio", ascending=False)
+
+    # Andamento mensile: una chiave unica per (mittente, mese) e due bincount
+    months = (data_inizio.dt.year * 12 + data_inizio.dt.month - 1).to_numpy()
+    first_month = months.min()
+    n_months = months.max() - first_month + 1
+    keys = codes * n_months + (months - first_month)
+    month_counts = np.bincount(keys, minlength=len(senders) * n_months).reshape(len(senders), n_months)
+    month_sums = np.bincount(keys, weights=ritardo, minlength=len(senders) * n_months).reshape(len(senders), n_months)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        month_means = np.round(month_sums / month_counts, 1)
+    month_index = np.arange(first_month, first_month + n_months)
+    trend = pd.DataFrame({
+        "data": [f"{m % 12 + 1:02d}-{m // 12}" for m in month_index]
+    })
+    for i, sender in enumerate(senders):
+        if present[i]:
+            # I mesi senza pubblicazioni restano vuoti (None) nel grafico
+            trend[mapping[sender]] = pd.Series([None if np.isnan(v) else float(v) for v in month_means[i]], dtype=object)
+
+    return metrics.reset_index(drop=True), trend
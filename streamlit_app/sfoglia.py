@@ -1,5 +1,6 @@
+import pandas as pd
 import streamlit as st
-from common import filter_data
+from common import filter_positions
 
 def page_sfoglia(df):
     st.header("📄 SFOGLIA")
@@ -14,30 +15,31 @@ def page_sfoglia(df):
         data_da = col_date1.date_input("Data inizio", None)
         data_a = col_date2.date_input("Data fine", None)
 
-    # Filtriamo i dati automaticamente
-    filtered = filter_data(df, ricerca, tipo_atto, data_da, data_a)
-    filtered = filtered.sort_values("numero_pubblicazione", ascending=False)
+    # Filtriamo i dati automaticamente (posizioni già ordinate, dalla cache condivisa)
+    positions = filter_positions(df, ricerca, tipo_atto, data_da, data_a)
 
-    if filtered.empty:
+    if len(positions) == 0:
         st.info("Nessuna pubblicazione trovata con questi filtri.")
         return
 
-    # Creiamo una copia per visualizzare le colonne in formato "Title"
-    filtered_display = filtered.copy()
-    filtered_display.columns = [col.replace('_', ' ').title() for col in filtered_display.columns]
-
     if "sfoglia_index" not in st.session_state:
         st.session_state.sfoglia_index = 0
-    st.session_state.sfoglia_index = max(0, min(st.session_state.sfoglia_index, len(filtered) - 1))
+    st.session_state.sfoglia_index = max(0, min(st.session_state.sfoglia_index, len(positions) - 1))
 
-    current_pub = filtered.iloc[st.session_state.sfoglia_index]
-    st.subheader(f"Pubblicazione {st.session_state.sfoglia_index + 1} di {len(filtered)}")
+    # La navigazione legge solo la riga corrente
+    current_pub = df.iloc[positions[st.session_state.sfoglia_index]]
+    st.subheader(f"Pubblicazione {st.session_state.sfoglia_index + 1} di {len(positions)}")
 
-    # Visualizziamo tutte le colonne tranne "documento" e "allegati"
-    for col in filtered_display.columns:
-        col_original = col.lower().replace(' ', '_')
+    # Visualizziamo tutte le colonne (in formato "Title") tranne "documento" e "allegati"
+    for col_original in df.columns:
+        col = col_original.replace('_', ' ').title()
         if col_original not in ["documento", "allegati"]:
-            st.write(f"**{col}:** {current_pub[col_original]}")
+            value = current_pub[col_original]
+            if isinstance(value, pd.Timestamp):
+                value = value.strftime("%d/%m/%Y")
+            elif pd.isna(value):
+                value = "N/A"
+            st.write(f"**{col}:** {value}")
 
     # Documento Principale: mostriamo ogni link su una riga separata
     documento = current_pub.get("documento")
@@ -76,4 +78,4 @@ def page_sfoglia(df):
             st.session_state.sfoglia_index = 0
     with col_nav4:
         if st.button("⏩", use_container_width=True):
-            st.session_state.sfoglia_index += len(filtered) - 1
+            st.session_state.sfoglia_index += len(positions) - 1